@@ -5,13 +5,18 @@ for displaying in a terminal.
 """
 
 import argparse
+import functools
+import itertools
+import math
 import os
 import re
 import sys
 import xml.etree.ElementTree
-from typing import BinaryIO, Iterable, List, Optional, Tuple, Union
+from typing import BinaryIO, Iterable, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pyqrcode
+from numpy.typing import NDArray
 
 
 try:
@@ -33,140 +38,249 @@ HALF_CHARS = ' \u2580\u2584\u2588'  # blank, upper, lower, full block
 
 SVG_NS = '{http://www.w3.org/2000/svg}'
 
-FLOAT_REGEX = r'[-+]?(?:\d*\.\d+|\d+)(?:[eE][-+]?\d+)?'
+FLOAT_REGEX = r'[-+]?(?:\d+(?:\.\d+)?|\.\d+)(?:[eE][-+]?\d+)?'
 TRANSFORM_SCALE_RX = re.compile(f'^scale[(]({FLOAT_REGEX})[)]$')
 
 
+# Character classes for PathParser.tokenize() and PathParser.parse().
+# _CH_OTHER (digits, signs, '.' and junk) is left to _scan_number().
+# None of them is 0, see _CHAR_CLASSES below.
+_CH_OTHER, _CH_SPACE, _CH_COMMA, _CH_COMMAND = range(1, 5)
+
+
+def _char_class(ch: str) -> int:
+    # \s in regexps matches Unicode whitespace, and so does str.isspace()
+    if ch.isspace():
+        return _CH_SPACE
+    if ch == ',':
+        return _CH_COMMA
+    if ch in 'MmZzLlHhVvCcSsQqTtAa':
+        return _CH_COMMAND
+    return _CH_OTHER
+
+
+# All the classes are truthy, so _CHAR_CLASSES.get(ch) or _char_class(ch)
+# calls _char_class() only for characters outside ASCII
+_CHAR_CLASSES = {chr(c): _char_class(chr(c)) for c in range(128)}
+
+
+def _scan_number(path: str, start: int) -> int:
+    # Returns the end of the number starting at path[start], matching
+    # FLOAT_REGEX.  \d in regexps matches Unicode digits, and so does
+    # str.isdecimal(); float() accepts them too.
+    n = len(path)
+    pos = end = start + 1 if path[start] in '+-' else start
+    while end < n and path[end].isdecimal():
+        end += 1
+    if end + 1 < n and path[end] == '.' and path[end + 1].isdecimal():
+        end += 2
+        while end < n and path[end].isdecimal():
+            end += 1
+    if end == pos:
+        raise Error(
+            f'SVG path syntax error at position {start}: {path[start]}')
+    if end < n and path[end] in 'eE':
+        exp = end + 1
+        if exp < n and path[exp] in '+-':
+            exp += 1
+        if exp < n and path[exp].isdecimal():
+            end = exp + 1
+            while end < n and path[end].isdecimal():
+                end += 1
+    return end
+
+
 Token = Tuple[str, str]
 PathCommand = Tuple[str, Tuple[float, ...]]
+HorizontalLine = Tuple[float, float, float]  # x, y, width
 FileNameOrFileObject = Union['os.PathLike[str]', BinaryIO]
+Pixels = NDArray[np.uint8]
 
 
 class PathParser:
 
     # https://svgwg.org/svg2-draft/paths.html#PathDataBNF
 
-    TOKEN_RX = re.compile(
-        '|'.join([
-            r'(?P<wsp>\s+)',
-            r'(?P<comma>,)',
-            f'(?P<number>{FLOAT_REGEX})',
-            r'(?P<command>[MmZzLlHhVvCcSsQqTtAa])',
-            r'(?P<error>.)',  # must be last
-        ])
-    )
-
     @classmethod
-    def tokenize(cls, path: str) -> Iterable[Tuple[str, str]]:
-        for m in cls.TOKEN_RX.finditer(path):
-            kind = m.lastgroup
-            value = m.group()
-            if kind == 'wsp':
-                continue
-            if kind == 'error':
-                pos = m.start()
-                raise Error(
-                    f'SVG path syntax error at position {pos}: {value}')
-            assert kind is not None  # for mypy
-            yield (kind, value)
+    def tokenize(cls, path: str) -> List[Token]:
+        # A hand-written scanner that looks at every character once is
+        # faster than a regexp with named groups and one alternative per
+        # token kind.
+        classes = _CHAR_CLASSES
+        tokens: List[Token] = []
+        i, n = 0, len(path)
+        while i < n:
+            ch = path[i]
+            kind = classes.get(ch) or _char_class(ch)
+            if kind == _CH_SPACE:
+                i += 1
+            elif kind == _CH_COMMA:
+                tokens.append(('comma', ch))
+                i += 1
+            elif kind == _CH_COMMAND:
+                tokens.append(('command', ch))
+                i += 1
+            else:
+                end = _scan_number(path, i)
+                tokens.append(('number', path[i:end]))
+                i = end
+        return tokens
 
     @classmethod
-    def parse(cls, path: str) -> Iterable[PathCommand]:
+    def parse(cls, path: str) -> List[PathCommand]:
+        # Same as tokenize(), but collects the numbers into commands as it
+        # goes, without building a token list first.
+        classes = _CHAR_CLASSES
+        commands: List[PathCommand] = []
         command = None
         args: List[float] = []
-        for kind, value in cls.tokenize(path):
-            if kind == 'command':
+        i, n = 0, len(path)
+        while i < n:
+            ch = path[i]
+            kind = classes.get(ch) or _char_class(ch)
+            if kind == _CH_SPACE or kind == _CH_COMMA:
+                i += 1
+            elif kind == _CH_COMMAND:
                 if command:
-                    yield (command, tuple(args))
-                command, args = value, []
-            elif kind == 'number':
+                    commands.append((command, tuple(args)))
+                command, args = ch, []
+                i += 1
+            else:
+                end = _scan_number(path, i)
                 if command is None:
                     raise Error(
-                        f'SVG path should start with a command: {value}')
-                args.append(float(value))
-            elif kind == 'comma':
-                # let's just skip these
-                continue
-            else:  # pragma: nocover
-                assert False, f'did not expect {kind}'
+                        f'SVG path should start with a command: {path[i:end]}')
+                args.append(float(path[i:end]))
+                i = end
         if command:
-            yield (command, tuple(args))
+            commands.append((command, tuple(args)))
+        return commands
+
+
+# The lookup tables used for rendering depend only on the arguments, and
+# it's the same few arguments every time, so build them once.
+
+@functools.lru_cache()
+def _byte_lut(values: Tuple[bytes, bytes]) -> Pixels:
+    assert len(values[0]) == len(values[1])
+    # np.frombuffer() of a bytes object is read-only, so this is safe to share
+    return np.frombuffer(b''.join(values), dtype=np.uint8).reshape(
+        len(values), -1)
+
+
+@functools.lru_cache()
+def _codepoint_lut(chars: str) -> 'NDArray[np.uint32]':
+    lut = np.array([ord(ch) for ch in chars], dtype='<u4')
+    lut.flags.writeable = False
+    return lut
+
+
+def _lines_to_text(codepoints: 'NDArray[np.uint32]') -> str:
+    # Add an extra column for the newlines and decode all the UTF-32 code
+    # points in one go, instead of building a string for every line
+    height, width = codepoints.shape
+    text = np.empty((height, width + 1), dtype='<u4')
+    text[:, :width] = codepoints
+    text[:, width] = ord('\n')
+    # surrogatepass lets lone surrogates in chars through, like str does
+    return text.tobytes()[:-4].decode('utf-32-le', 'surrogatepass')
 
 
 class Canvas:
 
+    __slots__ = ('width', 'height', 'pixels')
+
     def __init__(self, width: int, height: int,
-                 pixels: Optional[List[List[int]]] = None) -> None:
+                 pixels: Optional[Pixels] = None) -> None:
         assert width >= 0
         assert height >= 0
         self.width = width
         self.height = height
         if pixels is None:
-            self.pixels = [[0] * width for _ in range(height)]
-        else:
-            assert len(pixels) == height
-            if height > 0:
-                assert len(pixels[0]) == width
-            self.pixels = pixels
+            pixels = np.zeros((height, width), dtype=np.uint8)
+        assert pixels.shape == (height, width)
+        self.pixels = pixels
 
     def horizontal_line(self, x: float, y: float, width: float) -> None:
         assert width > 0
+        if not all(map(math.isfinite, (x, y, width))):
+            raise Error(f'Cannot draw a line at ({x}, {y}) of width {width}')
         # PyQRCode draws 1-pixel thick horizontal lines, which means the
         # x coordinates are whole numbers, and the y coordinate is shifted by
         # 0.5 to point to the middle of the pixel
         y = int(y - 0.5)
-        if 0 <= y < self.height:
-            for x in range(int(x), int(x + width)):
-                if 0 <= x < self.width:
-                    self.pixels[y][x] = 1
+        start = int(max(0, x))
+        end = int(min(self.width, x + width))
+        if 0 <= y < self.height and start < end:
+            self.pixels[y, start:end] = 1
+
+    def horizontal_lines(self, lines: Sequence[HorizontalLine]) -> None:
+        # Same as calling horizontal_line() for each of the lines, but faster.
+
+        # np.fromiter() is a lot faster than np.array() on a list of tuples
+        coords = np.fromiter(
+            itertools.chain.from_iterable(lines), dtype=float,
+            count=3 * len(lines)).reshape(-1, 3)
+        finite = np.isfinite(coords).all(axis=1)
+        if not finite.all():
+            x, y, width = coords[finite.argmin()]
+            raise Error(f'Cannot draw a line at ({x}, {y}) of width {width}')
+        x, y, width = coords.T
+        assert (width > 0).all()
+        # Clip while the coordinates are still floats: astype(int) turns
+        # anything that doesn't fit in a C long into garbage
+        row = np.clip(y - 0.5, -1, self.height).astype(int)
+        start = np.clip(x, 0, self.width).astype(int)
+        with np.errstate(over='ignore'):  # inf is fine, it gets clipped
+            end = np.clip(x + width, 0, self.width).astype(int)
+        keep = (0 <= row) & (row < self.height) & (start < end)
+        row, start, end = row[keep], start[keep], end[keep]
+        # Mark where each line starts and ends, then a running sum along
+        # each row tells how many lines cover each pixel.
+        edges = np.zeros((self.height, self.width + 1), dtype=int)
+        np.add.at(edges, (row, start), 1)
+        np.add.at(edges, (row, end), -1)
+        self.pixels[edges.cumsum(axis=1)[:, :-1] > 0] = 1
 
     def to_bytes(self, values: Tuple[bytes, bytes] = (b'\xFF', b'\0'),
                  xscale: int = 1, yscale: int = 1) -> bytes:
-        return b''.join(
-            b''.join(values[px] * xscale for px in row) * yscale
-            for row in self.pixels
-        )
+        image = _byte_lut(values)[self.pixels]
+        return image.repeat(xscale, axis=1).repeat(yscale, axis=0).tobytes()
 
     def to_ascii_art(self, chars: str = FULL_CHARS, xscale: int = 1) -> str:
-        return '\n'.join(
-            ''.join(chars[px] * xscale for px in row) for row in self.pixels)
+        pixels = self.pixels.repeat(xscale, axis=1)
+        return _lines_to_text(_codepoint_lut(chars)[pixels])
 
     def to_unicode_blocks(self, chars: str = HALF_CHARS) -> str:
         pixels = self.pixels
         if self.height % 2 == 1:
-            pixels = pixels + [[0] * self.width]
-        return '\n'.join(
-            ''.join(chars[pixels[y+1][x] * 2 + pixels[y][x]]
-                    for x in range(self.width))
-            for y in range(0, self.height, 2))
+            pixels = self.pad(0, 0, 1, 0).pixels
+        return _lines_to_text(
+            _codepoint_lut(chars)[(pixels[1::2] << 1) | pixels[0::2]])
 
     def __str__(self) -> str:
         return self.to_ascii_art('.X')
 
     def line_is_blank(self, y: int) -> bool:
         assert 0 <= y < self.height
-        return not any(self.pixels[y])
+        return not self.pixels[y].any()
 
     def column_is_blank(self, x: int) -> bool:
         assert 0 <= x < self.width
-        return not any(self.pixels[y][x] for y in range(self.height))
+        return not self.pixels[:, x].any()
 
     def trim(self) -> 'Canvas':
-        top = 0
-        while top < self.height and self.line_is_blank(top):
-            top += 1
-        bottom = self.height
-        while bottom > top and self.line_is_blank(bottom - 1):
-            bottom -= 1
-        left = 0
-        while left < self.width and self.column_is_blank(left):
-            left += 1
-        right = self.width
-        while right > left and self.column_is_blank(right - 1):
-            right -= 1
-        return self.__class__(right - left, bottom - top, [
-            row[left:right] for row in self.pixels[top:bottom]
-        ])
+        rows = self.pixels.any(axis=1)
+        columns = self.pixels.any(axis=0)
+        if not rows.any():
+            return self.__class__(0, 0)
+        top = int(rows.argmax())
+        bottom = self.height - int(np.flip(rows).argmax())
+        left = int(columns.argmax())
+        right = self.width - int(np.flip(columns).argmax())
+        return self.__class__(
+            right - left, bottom - top,
+            self.pixels[top:bottom, left:right].copy())
 
     def pad(self, top: int, right: int, bottom: int, left: int) -> 'Canvas':
         assert top >= 0
@@ -175,22 +289,20 @@ class Canvas:
         assert left >= 0
         new_width = self.width + left + right
         new_height = self.height + top + bottom
-        left_pad = [0] * left
-        right_pad = [0] * right
-        top_pad = [[0] * new_width for _ in range(top)]
-        bottom_pad = [[0] * new_width for _ in range(bottom)]
-        return self.__class__(new_width, new_height, top_pad + [
-            left_pad + row + right_pad for row in self.pixels
-        ] + bottom_pad)
+        # np.pad() is very general and therefore slow, filling a blank
+        # canvas is several times faster
+        pixels = np.zeros((new_height, new_width), dtype=np.uint8)
+        pixels[top:top + self.height, left:left + self.width] = self.pixels
+        return self.__class__(new_width, new_height, pixels)
 
     def invert(self) -> 'Canvas':
-        return self.__class__(self.width, self.height, [
-            [1 - px for px in row] for row in self.pixels
-        ])
+        return self.__class__(self.width, self.height, 1 - self.pixels)
 
 
 class Path:
 
+    __slots__ = ('x', 'y', 'canvas')
+
     def __init__(self, canvas: Canvas) -> None:
         # Technically the very first path drawing command must be an absolute
         # move_to, so the initial coordinates are undefined.
@@ -206,24 +318,38 @@ class Path:
         self.x += dx
         self.y += dy
 
-    def horizontal_line_rel(self, dx: float) -> None:
+    def _line_rel(self, dx: float) -> Optional[HorizontalLine]:
+        # Moves by dx and returns the line that was covered, if any
+        x = self.x
+        self.x += dx
         if dx > 0:
-            self.canvas.horizontal_line(self.x, self.y, dx)
+            return (x, self.y, dx)
         elif dx < 0:
-            self.canvas.horizontal_line(self.x + dx, self.y, -dx)
-        self.x += dx
+            return (x + dx, self.y, -dx)
+        else:
+            return None
+
+    def horizontal_line_rel(self, dx: float) -> None:
+        line = self._line_rel(dx)
+        if line:
+            self.canvas.horizontal_line(*line)
 
     def draw(self, commands: Iterable[PathCommand]) -> None:
+        # Collect all the lines first and then draw them in one go
+        lines: List[HorizontalLine] = []
         for cmd, args in commands:
             if cmd == 'M' and len(args) == 2:
                 self.move_to(*args)
             elif cmd == 'm' and len(args) == 2:
                 self.move_by(*args)
             elif cmd == 'h' and len(args) == 1:
-                self.horizontal_line_rel(*args)
+                line = self._line_rel(*args)
+                if line:
+                    lines.append(line)
             else:
                 raise Error(f'Did not expect drawing command {cmd}'
                             f' with {len(args)} parameters')
+        self.canvas.horizontal_lines(lines)
 
 
 class QR:
@@ -267,18 +393,44 @@ class QR:
         code = pyqrcode.create(text, encoding='UTF-8')
         data = code.text().splitlines()
         qr = cls(len(data))
-        qr.canvas.pixels = [
-            [int(px) for px in row] for row in data
-        ]
+        qr.canvas.pixels = np.frombuffer(
+            ''.join(data).encode('ascii'), dtype=np.uint8,
+        ).reshape(qr.size, qr.size) - ord('0')
         return qr
 
     @classmethod
-    def from_svg(cls, fileobj: FileNameOrFileObject) -> 'QR':
+    def _parse_svg(
+        cls, fileobj: BinaryIO,
+    ) -> Tuple[xml.etree.ElementTree.Element,
+               Optional[xml.etree.ElementTree.Element]]:
+        # Returns the root element and the <path> with the QR code, and
+        # stops reading as soon as it finds the latter.
+        root = None
+        depth = 0
+        events = xml.etree.ElementTree.iterparse(
+            fileobj, events=('start', 'end'))
         try:
-            tree = xml.etree.ElementTree.parse(fileobj)
+            for event, elem in events:
+                if event == 'end':
+                    depth -= 1
+                    continue
+                depth += 1
+                if root is None:
+                    root = elem
+                elif (depth == 2 and elem.tag == f"{SVG_NS}path"
+                      and elem.get('class') == 'pyqrline'):
+                    return root, elem
         except xml.etree.ElementTree.ParseError as e:
             raise Error(f"Couldn't parse SVG: {e}")
-        root = tree.getroot()
+        assert root is not None  # empty documents are a ParseError
+        return root, None
+
+    @classmethod
+    def from_svg(cls, fileobj: FileNameOrFileObject) -> 'QR':
+        if isinstance(fileobj, (str, os.PathLike)):
+            with open(fileobj, 'rb') as fp:
+                return cls.from_svg(fp)
+        root, path = cls._parse_svg(fileobj)
         if root.tag != f"{SVG_NS}svg":
             raise Error(f"This is not an SVG image: <{root.tag}>")
         if root.get('class') != 'pyqrcode':
@@ -296,7 +448,6 @@ class QR:
             height = cls.get_dim(root, 'height')
         if width != height:
             raise Error(f"Image is not square: {width} x {height}")
-        path = root.find(f"{SVG_NS}path[@class='pyqrline']")
         if path is None:
             raise Error("Did not find the QR code in the image")
         # path.get('transform') should be something like "scale(8)"
@@ -50,6 +50,7 @@ setup(
     py_modules=["qr2text"],
     zip_safe=False,
     install_requires=[
+        'numpy >= 1.21',
         'pyqrcode',
         'pyzbar',
     ],
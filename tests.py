@@ -18,18 +18,25 @@ from qr2text import QR, Canvas, Error, Path, PathParser, main
     ('  \n', []),
     ('1-2', [('number', '1'), ('number', '-2')]),
     ('1,2', [('number', '1'), ('comma', ','), ('number', '2')]),
+    ('1.5.5', [('number', '1.5'), ('number', '.5')]),
+    ('2e3-4.25E+15', [('number', '2e3'), ('number', '-4.25E+15')]),
+    ('M1\u00a0h-1', [('command', 'M'), ('number', '1'),
+                     ('command', 'h'), ('number', '-1')]),
 ])
 def test_PathParser_tokenize(path, expected):
     assert list(PathParser.tokenize(path)) == expected
 
 
-def test_PathParser_tokenize_error():
-    path = 'qwerty'
+@pytest.mark.parametrize("path, error", [
+    ('qwerty', "SVG path syntax error at position 1: w"),
+    ('1.e5', "SVG path syntax error at position 1: ."),
+    ('1e+', "SVG path syntax error at position 1: e"),
+    ('M+', "SVG path syntax error at position 1: +"),
+])
+def test_PathParser_tokenize_error(path, error):
     with pytest.raises(Error) as ctx:
         list(PathParser.tokenize(path))
-    assert str(ctx.value) == (
-        "SVG path syntax error at position 1: w"
-    )
+    assert str(ctx.value) == error
 
 
 @pytest.mark.parametrize("d, expected", [
@@ -45,6 +52,7 @@ def test_PathParser_tokenize_error():
     ('h 1 v 2', [('h', (1,)), ('v', (2,))]),
     ('z', [('z', ())]),
     ('M 1 2 3 4', [('M', (1, 2, 3, 4))]),
+    ('m.76.76-.5.5', [('m', (.76, .76, -.5, .5))]),
     ('M 6,10\nA 6 4 10 1 0 14,10',
      [('M', (6, 10)), ('A', (6, 4, 10, 1, 0, 14, 10))]),
 ])
@@ -61,6 +69,15 @@ def test_PathParser_parse_error():
     )
 
 
+def test_PathParser_parse_syntax_error():
+    path = 'M 1 2 h 3x'
+    with pytest.raises(Error) as ctx:
+        list(PathParser.parse(path))
+    assert str(ctx.value) == (
+        "SVG path syntax error at position 9: x"
+    )
+
+
 def test_Canvas():
     canvas = Canvas(5, 3)
     canvas.horizontal_line(0, 0.5, 5)
@@ -73,6 +90,67 @@ def test_Canvas():
     ])
 
 
+def test_Canvas_horizontal_lines():
+    canvas = Canvas(5, 3)
+    canvas.horizontal_lines([
+        (0, 0.5, 5),
+        (1, 1.5, 1),
+        (2, 1.5, 2),
+        (-2, 2.5, 3),
+        (4, 2.5, 4),
+        (0, 3.5, 5),
+    ])
+    assert str(canvas) == '\n'.join([
+        'XXXXX',
+        '.XXX.',
+        'X...X',
+    ])
+
+
+@pytest.mark.parametrize("line", [
+    (0, 0.5, 1e30),
+    (-1e30, 1.5, 2e30),
+    (1e30, 1.5, 1),
+    (-1e30, 1.5, 1),
+    (0, 1e30, 5),
+    (0, -1e30, 5),
+    (1e308, 0.5, 1e308),
+    (0, 0.5, 1e308),
+])
+def test_Canvas_horizontal_lines_huge(line):
+    canvas = Canvas(5, 3)
+    canvas.horizontal_line(*line)
+    expected = str(canvas)
+    canvas = Canvas(5, 3)
+    canvas.horizontal_lines([line])
+    assert str(canvas) == expected
+
+
+@pytest.mark.parametrize("line", [
+    (0.0, 0.5, float('inf')),
+    (float('-inf'), 0.5, 5.0),
+    (0.0, float('nan'), 5.0),
+])
+def test_Canvas_horizontal_lines_not_finite(line):
+    canvas = Canvas(5, 3)
+    with pytest.raises(Error) as ctx:
+        canvas.horizontal_line(*line)
+    expected = str(ctx.value)
+    with pytest.raises(Error) as ctx:
+        canvas.horizontal_lines([(0, 0.5, 1), line])
+    assert str(ctx.value) == expected
+
+
+def test_Canvas_horizontal_lines_none():
+    canvas = Canvas(5, 3)
+    canvas.horizontal_lines([])
+    assert str(canvas) == '\n'.join([
+        '.....',
+        '.....',
+        '.....',
+    ])
+
+
 def test_Canvas_invert():
     canvas = Canvas(5, 3)
     canvas.horizontal_line(0, 0.5, 5)
@@ -85,6 +163,20 @@ def test_Canvas_invert():
     ])
 
 
+def test_Canvas_line_is_blank():
+    canvas = Canvas(5, 3)
+    canvas.horizontal_line(1, 1.5, 3)
+    assert [canvas.line_is_blank(y) for y in range(3)] == [True, False, True]
+
+
+def test_Canvas_column_is_blank():
+    canvas = Canvas(5, 3)
+    canvas.horizontal_line(1, 1.5, 3)
+    assert [canvas.column_is_blank(x) for x in range(5)] == [
+        True, False, False, False, True,
+    ]
+
+
 def test_Canvas_trim():
     canvas = Canvas(5, 3)
     canvas.horizontal_line(1, 1.5, 3)
@@ -134,6 +226,14 @@ def test_Canvas_unicode_small():
     ])
 
 
+def test_Canvas_lone_surrogates():
+    # Any str works for chars, even one that can't be encoded
+    canvas = Canvas(2, 2)
+    canvas.horizontal_line(0, 0.5, 1)
+    assert canvas.to_ascii_art('\ud800X') == 'X\ud800\n\ud800\ud800'
+    assert canvas.to_unicode_blocks('\udc00abc') == 'a\udc00'
+
+
 def test_Canvas_to_bytes():
     canvas = Canvas(5, 3)
     canvas.horizontal_line(0, 0.5, 5)
@@ -164,6 +264,17 @@ def test_Canvas_to_bytes_scaled():
     ])
 
 
+def test_Canvas_to_bytes_rgb():
+    canvas = Canvas(3, 1)
+    canvas.horizontal_line(1, 0.5, 1)
+    values = (b'\xFF\xFF\xFF', b'\x00\x00\x00')
+    assert canvas.to_bytes(values, xscale=2) == b''.join([
+        b'\xFF\xFF\xFF\xFF\xFF\xFF',
+        b'\x00\x00\x00\x00\x00\x00',
+        b'\xFF\xFF\xFF\xFF\xFF\xFF',
+    ])
+
+
 def test_Path():
     canvas = Canvas(5, 3)
     path = Path(canvas)
@@ -178,6 +289,19 @@ def test_Path():
     ])
 
 
+def test_Path_horizontal_line_rel_zero():
+    canvas = Canvas(5, 3)
+    path = Path(canvas)
+    path.move_to(2, 1.5)
+    path.horizontal_line_rel(0)
+    assert str(canvas) == '\n'.join([
+        '.....',
+        '.....',
+        '.....',
+    ])
+    assert (path.x, path.y) == (2, 1.5)
+
+
 def test_Path_draw():
     canvas = Canvas(5, 3)
     path = Path(canvas)
@@ -206,6 +330,22 @@ def test_Path_draw_error():
     )
 
 
+def test_Path_draw_reports_syntax_errors_first():
+    # PathParser.parse() checks the whole path before Path.draw() gets to
+    # see any of the commands, so syntax errors take precedence, and
+    # nothing gets drawn
+    canvas = Canvas(5, 3)
+    path = Path(canvas)
+    with pytest.raises(Error) as ctx:
+        path.draw(PathParser.parse('M0 .5h2mme1'))
+    assert str(ctx.value) == 'SVG path syntax error at position 9: e'
+    assert str(canvas) == '\n'.join([
+        '.....',
+        '.....',
+        '.....',
+    ])
+
+
 def test_QR_when_empty():
     qr = QR(29)
     assert qr.to_ascii_art(trim=True) == ''
@@ -249,6 +389,22 @@ def test_QR_from_svg(kwargs):
     assert qr.decode() == b'A'
 
 
+def test_QR_from_svg_filename(tmp_path):
+    filename = tmp_path / 'a.svg'
+    pyqrcode.create('A', error='L').svg(str(filename))
+    qr = QR.from_svg(filename)
+    assert qr.size == 29
+
+
+def test_QR_from_svg_stops_reading_after_the_qr_code():
+    buffer = BytesIO()
+    pyqrcode.create('A', error='L').svg(buffer)
+    buffer.seek(0)
+    svg = buffer.getvalue().replace(b'</svg>', b'<rect></svg>')
+    qr = QR.from_svg(BytesIO(svg))
+    assert qr.size == 29
+
+
 svg = 'svg xmlns="http://www.w3.org/2000/svg"'
 
 
@@ -269,6 +425,10 @@ svg = 'svg xmlns="http://www.w3.org/2000/svg"'
      "Couldn't parse width: 5mm"),
     (f'<{svg} class="pyqrcode" viewBox="0 0 5 5"></svg>',
      "Did not find the QR code in the image"),
+    (f'<{svg} class="pyqrcode" viewBox="0 0 5 5">'
+     '<g><path class="pyqrline" /></g>'
+     '</svg>',
+     "Did not find the QR code in the image"),
     (f'<{svg} class="pyqrcode" viewBox="0 0 5 5">'
      '<path class="pyqrline" transform="translate(4.5)" />'
      '</svg>',